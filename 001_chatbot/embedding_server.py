@@ -0,0 +1,320 @@
+"""
+로컬 임베딩 모델 서버
+
+- 임베딩 모델(SentenceTransformer)을 서버 프로세스에서 한 번만 로드하고,
+  여러 앱 프로세스(노트북, Gradio 워커 등)가 Unix 소켓으로 요청하여 같은 모델을 공유
+- 임베딩 결과는 연결마다 할당된 공유 메모리(shared memory)에 기록 → 클라이언트는 복사 없이 numpy 배열로 읽기
+- 여러 클라이언트의 요청을 모아서 한 번에 인코딩 (dynamic batching)
+
+실행 예시:
+    python embedding_server.py --model bge-m3=BAAI/bge-m3 --model ko-sroberta=jhgan/ko-sroberta-multitask
+
+클라이언트 예시:
+    from embedding_server import SharedEmbeddings
+    embeddings = SharedEmbeddings(model="bge-m3")
+    vectors = embeddings.embed_documents(["문장1", "문장2"])
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_SOCKET_PATH = "/tmp/embedding_server.sock"
+HEADER = struct.Struct("!I")   # 메시지 길이 (4바이트)
+
+
+# ============================================
+# 메시지 송수신 (길이 + JSON)
+# ============================================
+def send_message(sock: socket.socket, message: Dict):
+    data = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError("연결이 종료되었습니다.")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def recv_message(sock: socket.socket) -> Dict:
+    (size,) = HEADER.unpack(recv_exact(sock, HEADER.size))
+    return json.loads(recv_exact(sock, size).decode("utf-8"))
+
+
+# ============================================
+# 동적 배치 처리
+# ============================================
+class DynamicBatcher:
+    """여러 요청의 문장을 모아서 한 번에 인코딩하는 배치 처리기 (모델별 1개)"""
+
+    def __init__(self, model, max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        self.model = model
+        self.max_batch_size = max_batch_size      # 한 번에 인코딩할 최대 문장 수
+        self.max_wait = max_wait_ms / 1000        # 다른 요청을 기다리는 최대 시간
+        self.requests = queue.Queue()
+        self.dimension = model.get_sentence_embedding_dimension()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, texts: List[str]) -> Future:
+        future = Future()
+        self.requests.put((texts, future))
+        return future
+
+    def _collect(self) -> List[tuple]:
+        # 첫 요청은 올 때까지 대기, 이후 요청은 max_wait 동안만 추가로 수집
+        batch = [self.requests.get()]
+        size = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+        return batch
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(texts, batch_size=self.max_batch_size, convert_to_numpy=True)
+        return vectors.astype(np.float32, copy=False)
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [text for request_texts, _ in batch for text in request_texts]
+            try:
+                vectors = self._encode(texts)
+            except Exception:
+                # 배치 인코딩 실패 → 요청별로 다시 인코딩하여 문제가 있는 요청만 실패 처리
+                for request_texts, future in batch:
+                    try:
+                        future.set_result(self._encode(request_texts))
+                    except Exception as e:
+                        future.set_exception(e)
+                continue
+
+            # 요청별로 결과 분배
+            start = 0
+            for request_texts, future in batch:
+                future.set_result(vectors[start:start + len(request_texts)])
+                start += len(request_texts)
+
+
+# ============================================
+# 서버
+# ============================================
+class EmbeddingRequestHandler(socketserver.BaseRequestHandler):
+    """클라이언트 연결 1개를 처리 (연결마다 공유 메모리 버퍼 1개 사용)"""
+
+    def setup(self):
+        self.shm = None
+
+    def _ensure_buffer(self, nbytes: int):
+        # 버퍼가 부족하면 2배씩 늘려서 새로 할당
+        if self.shm is not None and self.shm.size >= nbytes:
+            return
+        size = max(nbytes, 1 << 20)
+        if self.shm is not None:
+            size = max(size, self.shm.size * 2)
+            self._release_buffer()
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+
+    def _release_buffer(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def handle(self):
+        while True:
+            try:
+                request = recv_message(self.request)
+            except (ConnectionError, OSError):
+                break
+
+            try:
+                response = self._process(request)
+            except Exception as e:
+                response = {"error": f"{type(e).__name__}: {e}"}
+            send_message(self.request, response)
+
+    def _process(self, request: Dict) -> Dict:
+        batchers = self.server.batchers
+        if request.get("op") == "info":
+            return {"models": {name: batcher.dimension for name, batcher in batchers.items()}}
+
+        model = request["model"]
+        if model not in batchers:
+            raise KeyError(f"등록되지 않은 모델입니다: {model}")
+
+        # 잘못된 요청은 배치에 넣기 전에 거부 (같은 배치의 다른 요청까지 실패하지 않도록)
+        texts = request.get("texts")
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            raise ValueError("texts는 문자열 리스트여야 합니다.")
+
+        if not texts:
+            return {"shm": None, "shape": [0, batchers[model].dimension], "dtype": "float32"}
+
+        vectors = batchers[model].submit(texts).result()
+        if request.get("normalize"):
+            vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+
+        # 결과를 공유 메모리에 기록 → 클라이언트는 같은 메모리를 numpy 배열로 바로 읽음
+        self._ensure_buffer(vectors.nbytes)
+        np.ndarray(vectors.shape, dtype=np.float32, buffer=self.shm.buf)[:] = vectors
+        return {"shm": self.shm.name, "shape": list(vectors.shape), "dtype": "float32"}
+
+    def finish(self):
+        self._release_buffer()
+
+
+class EmbeddingServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, models: Dict[str, str], device: str = "cpu",
+                 max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        from sentence_transformers import SentenceTransformer
+
+        # 모델은 서버 시작 시 한 번만 로드
+        self.batchers = {}
+        for name, model_name in models.items():
+            start = time.time()
+            model = SentenceTransformer(model_name, device=device)
+            self.batchers[name] = DynamicBatcher(model, max_batch_size, max_wait_ms)
+            print(f"모델 로드 완료: {name} ({model_name}, {time.time() - start:.1f}초)")
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, EmbeddingRequestHandler)
+        self.socket_path = socket_path
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+# ============================================
+# 클라이언트 (LangChain Embeddings 인터페이스)
+# ============================================
+class _SharedSegment:
+    """클라이언트 쪽 공유 메모리 매핑 - 이 매핑을 참조하는 배열이 모두 사라진 뒤에 해제"""
+
+    def __init__(self, name: str):
+        self.shm = shared_memory.SharedMemory(name=name)
+        # 공유 메모리는 서버가 관리 → 클라이언트 종료 시 삭제되지 않도록 추적 해제
+        resource_tracker.unregister(self.shm._name, "shared_memory")
+
+    def array(self, shape: tuple, dtype: str) -> np.ndarray:
+        """공유 메모리 위의 배열 반환 (배열이 살아 있는 동안 매핑이 유지되도록 세그먼트를 base로 연결)"""
+        view = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        return np.asarray(_ArrayOwner(self, view.__array_interface__))
+
+    def __del__(self):
+        try:
+            self.shm.close()
+        except (BufferError, OSError):
+            pass
+
+
+class _ArrayOwner:
+    """배열의 base 객체 - 세그먼트 참조를 유지하여 사용 중인 매핑이 해제되지 않게 함"""
+
+    def __init__(self, segment: _SharedSegment, interface: Dict):
+        self.segment = segment
+        self.__array_interface__ = interface
+
+
+class SharedEmbeddings(Embeddings):
+    """임베딩 서버를 사용하는 LangChain 임베딩 클래스 (모델을 직접 로드하지 않음)"""
+
+    def __init__(self, model: str, socket_path: str = DEFAULT_SOCKET_PATH, normalize: bool = False):
+        self.model = model
+        self.normalize = normalize
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+        self.segment = None
+        self.lock = threading.Lock()   # 연결과 공유 메모리 버퍼를 스레드 간에 공유하므로 요청을 순서대로 처리
+
+    def _attach(self, name: str):
+        if self.segment is not None and self.segment.shm.name == name:
+            return
+        # 서버가 버퍼를 늘리면 새 세그먼트로 교체
+        # 이전 세그먼트는 닫지 않음 → 이전에 반환한 배열이 남아 있으면 그 배열이 매핑을 유지
+        self.segment = _SharedSegment(name)
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """임베딩을 공유 메모리 위의 numpy 배열(복사 없음)로 반환
+
+        반환된 배열의 값은 다음 요청에서 덮어써질 수 있음 → 보관하려면 .copy() 사용
+        """
+        with self.lock:
+            send_message(self.sock, {"model": self.model, "texts": texts, "normalize": self.normalize})
+            response = recv_message(self.sock)
+            if "error" in response:
+                raise RuntimeError(response["error"])
+            if response["shm"] is None:
+                return np.zeros(tuple(response["shape"]), dtype=response["dtype"])
+            self._attach(response["shm"])
+            return self.segment.array(tuple(response["shape"]), response["dtype"])
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+
+    def info(self) -> Dict:
+        with self.lock:
+            send_message(self.sock, {"op": "info"})
+            return recv_message(self.sock)
+
+    def close(self):
+        # 매핑은 남아 있는 배열이 모두 사라질 때 해제
+        self.segment = None
+        self.sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="로컬 임베딩 모델 서버")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH, help="Unix 소켓 경로")
+    parser.add_argument("--model", action="append", required=True,
+                        help="모델 등록 (이름=HuggingFace 모델명), 여러 번 지정 가능")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    models = dict(item.split("=", 1) for item in args.model)
+    server = EmbeddingServer(args.socket, models, args.device, args.max_batch_size, args.max_wait_ms)
+    print(f"임베딩 서버 시작: {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("임베딩 서버 종료")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -25,6 +25,18 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.lib.enums import TA_LEFT
 import re
+import hashlib
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import sys
+
+# 공통 모듈(001_chatbot/single_flight.py)의 SingleFlight 사용 (W3_006 노트북과 같은 구현)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from single_flight import SingleFlight
 
 # 환경변수 로드
 load_dotenv()
@@ -193,32 +205,59 @@ def add_map_links(response):
     return response
 
 
-def export_conversation(history):
-    """대화 내용을 PDF 파일로 저장 (한글 지원)"""
+def register_korean_font():
+    """한글 폰트 등록 (앱 시작 시 한 번만 호출)"""
+    # Windows 맑은 고딕 → 굴림 순서로 시도
+    for font_name, font_file in [('Malgun', 'malgun.ttf'), ('Gulim', 'gulim.ttc')]:
+        try:
+            pdfmetrics.registerFont(TTFont(font_name, font_file))
+            return font_name
+        except Exception:
+            continue
+    # 폰트 등록 실패 시 기본 폰트 사용 (한글 깨짐)
+    return 'Helvetica'
+
+
+# 한글 폰트는 프로세스당 한 번만 등록
+PDF_FONT_NAME = register_korean_font()
+
+# 마크다운 기호 제거용 정규식 (미리 컴파일)
+MARKDOWN_PATTERN = re.compile(r'[#*`]')
+
+
+def clean_pdf_content(content):
+    """PDF 본문용 메시지 정리 (마크다운 제거 및 HTML 이스케이프)"""
+    # 마크다운 기호 제거
+    content = MARKDOWN_PATTERN.sub('', content)
+    # HTML 특수문자 이스케이프
+    content = content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    # 줄바꿈 처리
+    content = content.replace('\n', '<br/>')
+    
+    # 내용이 너무 길면 잘라내기
+    if len(content) > 5000:
+        content = content[:5000] + "... (내용이 너무 길어 생략됨)"
+    return content
+
+
+def export_conversation(history, base_path=None):
+    """대화 내용을 PDF 파일로 저장 (한글 지원)
+    
+    base_path: 확장자를 제외한 저장 경로 (없으면 현재 디렉터리에 시간 기반 이름으로 저장)
+    """
     if not history:
         return None
         
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"여행계획_{timestamp}.pdf"
+    if base_path is None:
+        base_path = f"여행계획_{timestamp}"
+    filename = f"{base_path}.pdf"
     
     try:
         # PDF 문서 생성
         doc = SimpleDocTemplate(filename, pagesize=A4)
         story = []
-        
-        # 한글 폰트 등록 (Windows 기본 폰트 사용)
-        try:
-            # Windows 맑은 고딕 폰트 사용
-            pdfmetrics.registerFont(TTFont('Malgun', 'malgun.ttf'))
-            font_name = 'Malgun'
-        except:
-            try:
-                # 맑은 고딕이 없으면 굴림 사용
-                pdfmetrics.registerFont(TTFont('Gulim', 'gulim.ttc'))
-                font_name = 'Gulim'
-            except:
-                # 폰트 등록 실패 시 기본 폰트 사용 (한글 깨짐)
-                font_name = 'Helvetica'
+        font_name = PDF_FONT_NAME
         
         # 스타일 설정
         styles = getSampleStyleSheet()
@@ -257,19 +296,7 @@ def export_conversation(history):
             story.append(Paragraph(role_text, body_style))
             
             # 메시지 내용 (마크다운 제거 및 HTML 이스케이프)
-            content = msg['content']
-            # 마크다운 기호 제거
-            content = re.sub(r'[#*`]', '', content)
-            # HTML 특수문자 이스케이프
-            content = content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-            # 줄바꿈 처리
-            content = content.replace('\n', '<br/>')
-            
-            # 내용이 너무 길면 잘라내기
-            if len(content) > 5000:
-                content = content[:5000] + "... (내용이 너무 길어 생략됨)"
-            
-            story.append(Paragraph(content, body_style))
+            story.append(Paragraph(clean_pdf_content(msg['content']), body_style))
             story.append(Spacer(1, 0.2*inch))
             
             # 구분선
@@ -284,7 +311,7 @@ def export_conversation(history):
     except Exception as e:
         print(f"PDF 생성 오류: {e}")
         # PDF 생성 실패 시 텍스트 파일로 대체
-        txt_filename = f"여행계획_{timestamp}.txt"
+        txt_filename = f"{base_path}.txt"
         content = "=" * 50 + "\n"
         content += "여행 계획 대화 내용\n"
         content += f"생성 시간: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
@@ -301,10 +328,137 @@ def export_conversation(history):
         return txt_filename
 
 
-def answer_invoke_stream(message, history, model_name, temperature, max_tokens):
-    """메시지 처리 및 응답 생성 (스트리밍)"""
-    chain = create_chain(model_name, temperature, max_tokens)
+class ExportService:
+    """대화 내보내기 백그라운드 서비스
+    - 워커 풀에서 파일 생성 (다른 사용자의 채팅을 막지 않음)
+    - 대화 내용 해시 기반 캐시 (변경 없는 대화는 다시 만들지 않음)
+    - 관리되는 임시 디렉터리에 저장, 용량 초과 시 오래된 파일부터 삭제
+    """
+    
+    def __init__(self, max_workers=2, max_cache_bytes=200 * 1024 * 1024, output_dir=None, job_ttl_seconds=600):
+        self.output_dir = output_dir or tempfile.mkdtemp(prefix="travel_export_")
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.max_cache_bytes = max_cache_bytes
+        self.job_ttl_seconds = job_ttl_seconds   # 아무도 조회하지 않은 작업을 정리하는 시간
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export")
+        self.lock = threading.Lock()
+        self.jobs = {}              # 작업 ID -> (Future, 등록 시각)
+        self.pending = {}           # 대화 해시 -> 진행 중인 Future
+        self.cache = OrderedDict()  # 대화 해시 -> 파일 경로 (LRU 순서)
+    
+    @staticmethod
+    def history_hash(history):
+        """대화 내용 해시 (역할 + 내용 기준)"""
+        payload = json.dumps(
+            [[msg['role'], msg['content']] for msg in history],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def submit(self, history):
+        """내보내기 작업 등록 후 작업 ID 반환 (요청마다 고유한 ID)"""
+        key = self.history_hash(history)
+        
+        with self.lock:
+            self._expire_jobs()
+            job_id = uuid.uuid4().hex
+            
+            # 캐시 적중: 이미 만들어진 파일을 바로 반환
+            cached = self.cache.get(key)
+            if cached and os.path.exists(cached):
+                self.cache.move_to_end(key)
+                future = Future()
+                future.set_result(cached)
+            # 같은 대화가 생성 중이면 기존 작업의 Future 공유 (작업 ID는 따로 발급)
+            elif key in self.pending:
+                future = self.pending[key]
+            else:
+                # 핸들러 이후 history가 바뀌어도 영향이 없도록 복사본 전달
+                snapshot = [{'role': msg['role'], 'content': msg['content']} for msg in history]
+                future = self.executor.submit(self._render, key, snapshot)
+                self.pending[key] = future
+            
+            self.jobs[job_id] = (future, time.monotonic())
+            return job_id
+    
+    def _expire_jobs(self):
+        """오래된 완료 작업 정리 (lock 보유 상태에서 호출)"""
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, (future, created) in self.jobs.items()
+            if future.done() and now - created > self.job_ttl_seconds
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+    
+    def _render(self, key, history):
+        """워커 스레드에서 파일 생성"""
+        try:
+            filename = export_conversation(history, os.path.join(self.output_dir, f"여행계획_{key[:16]}"))
+            with self.lock:
+                self.cache[key] = filename
+                self.cache.move_to_end(key)
+                self._evict()
+            return filename
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
     
+    def _evict(self):
+        """캐시 용량 초과 시 오래된 파일부터 삭제 (lock 보유 상태에서 호출)"""
+        sizes = {key: os.path.getsize(path) for key, path in self.cache.items() if os.path.exists(path)}
+        total = sum(sizes.values())
+        
+        # 방금 만든 파일은 남겨둠
+        while total > self.max_cache_bytes and len(self.cache) > 1:
+            key, path = self.cache.popitem(last=False)
+            total -= sizes.get(key, 0)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    
+    def status(self, job_id):
+        """작업 상태 조회 → (상태, 파일 경로)
+        
+        상태: "running" | "done" | "failed" | "unknown"
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return "unknown", None
+            future = job[0]
+            if not future.done():
+                return "running", None
+            # 작업 ID는 요청마다 고유하므로 조회한 요청의 항목만 삭제
+            self.jobs.pop(job_id, None)
+        
+        try:
+            return "done", future.result()
+        except Exception as e:
+            print(f"대화 내보내기 오류: {e}")
+            return "failed", None
+    
+    def shutdown(self):
+        """워커 풀 종료"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# 내보내기 서비스 (앱 전체에서 공유)
+export_service = ExportService()
+
+
+# LLM 호출 병합 (앱 전체에서 공유)
+llm_flight = SingleFlight()
+
+# 응답 생성 이벤트의 동시 처리 수 (Gradio 기본값은 1 → 요청이 순서대로 처리됨)
+LLM_CONCURRENCY_LIMIT = 16
+
+
+def answer_invoke_stream(message, history, model_name, temperature, max_tokens):
+    """메시지 처리 및 응답 생성 (스트리밍)
+    - 같은 대화 + 같은 모델 설정의 요청이 동시에 들어오면 LLM 호출 1번을 공유
+    """
     history_messages = []
     for msg in history:
         if msg['role'] == "user":
@@ -314,12 +468,22 @@ def answer_invoke_stream(message, history, model_name, temperature, max_tokens):
     
     history_messages.append(HumanMessage(content=message))
     
+    def start_stream():
+        chain = create_chain(model_name, temperature, max_tokens)
+        return chain.stream({
+            "chat_history": history_messages,
+            "user_input": message
+        })
+    
+    key = SingleFlight.make_key(
+        model_name, temperature, max_tokens,
+        [[msg['role'], msg['content']] for msg in history],
+        message
+    )
+    
     # AI 응답 스트리밍 생성
     full_response = ""
-    for chunk in chain.stream({
-        "chat_history": history_messages,
-        "user_input": message
-    }):
+    for chunk in llm_flight.stream(key, start_stream):
         full_response += chunk
         yield full_response
     
@@ -674,6 +838,10 @@ with gr.Blocks(title="🌍 LLM5기_6조 여행 계획 어시스턴트") as demo:
                     """)
                     export_session = gr.Button("📥 대화 내보내기", variant="primary", size="lg")
                     download_file = gr.File(label="다운로드 파일", visible=False)
+                    export_status = gr.Markdown("")
+                    # 내보내기 작업 ID와 상태 확인용 타이머 (작업 중에만 활성화)
+                    export_job = gr.State(None)
+                    export_timer = gr.Timer(1.0, active=False)
             
             gr.Markdown("---")
             
@@ -712,13 +880,27 @@ with gr.Blocks(title="🌍 LLM5기_6조 여행 계획 어시스턴트") as demo:
         return [], [], "💬 0", "👤 0", "🤖 0", "✅ 대화가 초기화되었습니다.", "0", "0", "0"
     
     def export_chat(history):
-        """대화 내보내기 (PDF)"""
+        """대화 내보내기 (PDF) - 백그라운드 작업 등록"""
         if not history:
             gr.Warning("저장할 대화가 없습니다.")
-            return None
-        filename = export_conversation(history)
-        gr.Info("대화가 PDF 파일로 저장되었습니다!")
-        return gr.File(value=filename, visible=True)
+            return None, "", gr.File(visible=False), gr.Timer(active=False)
+        job_id = export_service.submit(history)
+        return job_id, "⏳ PDF 파일을 만드는 중입니다...", gr.File(visible=False), gr.Timer(active=True)
+    
+    def poll_export(job_id):
+        """내보내기 작업 상태 확인"""
+        if not job_id:
+            return None, gr.update(), gr.update(), gr.Timer(active=False)
+        
+        status, filename = export_service.status(job_id)
+        if status == "running":
+            return job_id, gr.update(), gr.update(), gr.update()
+        if status == "done":
+            gr.Info("대화가 PDF 파일로 저장되었습니다!")
+            return None, "✅ 내보내기 완료", gr.File(value=filename, visible=True), gr.Timer(active=False)
+        
+        gr.Warning("대화 내보내기에 실패했습니다.")
+        return None, "⚠️ 내보내기 실패", gr.File(visible=False), gr.Timer(active=False)
     
     def quick_question(destination):
         """인기 여행지 빠른 질문"""
@@ -893,7 +1075,9 @@ with gr.Blocks(title="🌍 LLM5기_6조 여행 계획 어시스턴트") as demo:
     ).then(
         bot_response,
         [chat_history, model_choice, temperature, max_tokens],
-        [chat_history, chatbot, total_stat, user_stat, ai_stat]
+        [chat_history, chatbot, total_stat, user_stat, ai_stat],
+        concurrency_limit=LLM_CONCURRENCY_LIMIT,  # 동시에 처리해야 같은 질문이 LLM 호출을 공유할 수 있음
+        concurrency_id="llm"
     )
     
     submit.click(
@@ -903,7 +1087,9 @@ with gr.Blocks(title="🌍 LLM5기_6조 여행 계획 어시스턴트") as demo:
     ).then(
         bot_response,
         [chat_history, model_choice, temperature, max_tokens],
-        [chat_history, chatbot, total_stat, user_stat, ai_stat]
+        [chat_history, chatbot, total_stat, user_stat, ai_stat],
+        concurrency_limit=LLM_CONCURRENCY_LIMIT,  # 동시에 처리해야 같은 질문이 LLM 호출을 공유할 수 있음
+        concurrency_id="llm"
     )
     
     # 통계 새로고침
@@ -927,7 +1113,17 @@ with gr.Blocks(title="🌍 LLM5기_6조 여행 계획 어시스턴트") as demo:
         [chat_history, chatbot, total_stat, user_stat, ai_stat, clear_status, session_total, session_user, session_ai]
     )
     
-    export_session.click(export_chat, chat_history, download_file)
+    export_session.click(
+        export_chat,
+        chat_history,
+        [export_job, export_status, download_file, export_timer]
+    )
+    
+    export_timer.tick(
+        poll_export,
+        export_job,
+        [export_job, export_status, download_file, export_timer]
+    )
     
     refresh_session.click(
         refresh_session_info,
@@ -0,0 +1,94 @@
+"""
+동일 요청 병합 (single-flight)
+
+- 같은 요청이 동시에 여러 번 들어오면 업스트림 호출(검색, LLM 등)을 한 번만 실행하고 결과 스트림을 공유
+- 여러 앱(노트북, Gradio 앱)에서 같은 구현을 사용하도록 공통 모듈로 분리
+
+사용 예시:
+    from single_flight import SingleFlight
+    flight = SingleFlight()
+    key = SingleFlight.make_key(question, model_name)
+    for chunk in flight.stream(key, lambda: chain.stream({"question": question})):
+        print(chunk, end="")
+"""
+
+import hashlib
+import json
+import threading
+import unicodedata
+
+
+class SingleFlight:
+    """동일 요청 병합 (single-flight)
+    - 같은 키의 요청이 진행 중이면 새로 호출하지 않고 진행 중인 호출의 스트림을 함께 받음
+    - 업스트림 호출은 백그라운드 스레드에서 실행 → 먼저 요청한 사용자가 연결을 끊어도 나머지는 계속 수신
+    - 호출이 끝나면 키를 제거 (결과 캐시가 아니라 진행 중인 요청만 공유)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flights = {}                       # 키 -> 진행 중인 호출 상태
+        self.stats = {"calls": 0, "shared": 0}  # 업스트림 호출 수, 공유된 요청 수
+
+    @staticmethod
+    def make_key(*parts):
+        """요청 키 생성 (문자열은 유니코드 정규화 + 공백 정리)"""
+        def normalize(value):
+            if isinstance(value, str):
+                return " ".join(unicodedata.normalize("NFC", value).split())
+            if isinstance(value, (list, tuple)):
+                return [normalize(v) for v in value]
+            return value
+        payload = json.dumps(normalize(list(parts)), ensure_ascii=False, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def stream(self, key, start_stream):
+        """start_stream()이 반환하는 스트림을 같은 키의 모든 요청에 전달"""
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is None:
+                flight = {"chunks": [], "done": False, "error": None, "cond": threading.Condition()}
+                self.flights[key] = flight
+                self.stats["calls"] += 1
+                threading.Thread(target=self._pump, args=(key, flight, start_stream), daemon=True).start()
+            else:
+                self.stats["shared"] += 1
+
+        # 처음부터 버퍼를 따라 읽음 → 늦게 합류한 요청도 전체 스트림을 받음
+        position = 0
+        while True:
+            with flight["cond"]:
+                while position >= len(flight["chunks"]) and not flight["done"]:
+                    flight["cond"].wait()
+                new_chunks = flight["chunks"][position:]
+                done = flight["done"]
+
+            yield from new_chunks
+            position += len(new_chunks)
+
+            if done:
+                if flight["error"] is not None:
+                    raise flight["error"]
+                return
+
+    def invoke(self, key, func):
+        """스트리밍이 아닌 호출 (검색 등) 병합"""
+        for result in self.stream(key, lambda: iter([func()])):
+            return result
+
+    def _pump(self, key, flight, start_stream):
+        """업스트림 스트림을 읽어 버퍼에 기록하고 대기 중인 요청을 깨움"""
+        try:
+            for chunk in start_stream():
+                with flight["cond"]:
+                    flight["chunks"].append(chunk)
+                    flight["cond"].notify_all()
+        except Exception as e:
+            flight["error"] = e
+        finally:
+            # 완료 표시 전에 키를 제거 → 이후 요청은 새로 호출
+            with self.lock:
+                self.flights.pop(key, None)
+            with flight["cond"]:
+                flight["done"] = True
+                flight["cond"].notify_all()